@@ -0,0 +1,6 @@
+from .app_config import AppConfig, load_config
+
+__all__ = [
+    "AppConfig",
+    "load_config",
+]
@@ -0,0 +1,81 @@
+import tomllib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+MODELS_CONFIG_PATH = Path("prompting/configuration/models.toml")
+APP_CONFIG_PATH = Path("prompting/configuration/config.toml")
+
+
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    """
+    The settings from models.toml and config.toml, loaded once at startup.
+    Frozen so it can be shared (and pickled) without anyone changing it underway.
+    """
+    models: tuple[dict[str, Any], ...]
+    evaluation_model: dict[str, Any]
+    questions_dir: Path
+    results_dir: Path
+    log_file: Path
+    cache_file: Path
+    eval_batch_size: int
+    eval_retries: int
+    eval_concurrency: int
+    eval_single_call: bool
+    prompting_concurrency: int
+    question_concurrency: int
+    cache_enabled: bool
+    cache_persistent: bool
+    cache_maxsize: int
+    export_parquet: bool
+    log_format: str
+    google_genai_level: str
+
+
+def load_config(models_path: Path = MODELS_CONFIG_PATH, app_config_path: Path = APP_CONFIG_PATH) -> AppConfig:
+    """
+    Loads the model list and the application settings into an :class:`AppConfig`.
+
+    :param models_path: Path to the TOML file listing the models and paths.
+    :param app_config_path: Path to the TOML file with the application settings.
+    :return: The frozen configuration.
+    :raises ValueError: If no model is marked with ``use_for_evaluation``.
+    """
+    with open(models_path, "rb") as f:
+        config = tomllib.load(f)
+        models = config["models"]
+        paths = config.get("paths", {})
+        evaluation_model_config = next((m for m in models if m.get("use_for_evaluation")), None)
+
+    with open(app_config_path, "rb") as f:
+        app_config = tomllib.load(f)
+        eval_config = app_config.get("evaluation", {})
+        prompting_config = app_config.get("prompting", {})
+        logging_config = app_config.get("logging", {})
+        cache_config = app_config.get("cache", {})
+        export_config = app_config.get("export", {})
+
+    if not evaluation_model_config:
+        raise ValueError("No model found for evaluation. Please set 'use_for_evaluation' to true for one of the models in models.json.")
+
+    return AppConfig(
+        models=tuple(models),
+        evaluation_model=evaluation_model_config,
+        questions_dir=Path(paths.get("questions_dir", "prompting/configuration/questions")),
+        results_dir=Path(paths.get("results_dir", "results")),
+        log_file=Path(paths.get("log_file", "prompting.log")),
+        cache_file=Path(paths.get("cache_file", "cache/responses.sqlite3")),
+        eval_batch_size=eval_config.get("batch_size", 5),
+        eval_retries=eval_config.get("retries", 3),
+        eval_concurrency=eval_config.get("concurrency", 8),
+        eval_single_call=eval_config.get("single_call", False),
+        prompting_concurrency=prompting_config.get("concurrency", 8),
+        question_concurrency=prompting_config.get("question_concurrency", 4),
+        cache_enabled=cache_config.get("enabled", True),
+        cache_persistent=cache_config.get("persistent", True),
+        cache_maxsize=cache_config.get("maxsize", 4096),
+        export_parquet=export_config.get("parquet", False),
+        log_format=logging_config.get("format", '%(asctime)s - %(levelname)s - %(message)s'),
+        google_genai_level=logging_config.get("google_genai_level", "WARNING"),
+    )
@@ -1,208 +1,387 @@
+import asyncio
 import concurrent.futures
-import itertools
-import json
 import logging
+import math
 import re
-from pathlib import Path
+from typing import Optional
 
 import httpx
-import tomllib
-from tqdm import tqdm
+import orjson
+from tqdm.asyncio import tqdm_asyncio
 
+from configuration import AppConfig, load_config
 from prompt_builders.xml import XMLPromptBuilder
-from prompt_providers.gemini_api import GeminiAPIProvider
-from prompt_providers.interface import LLMProvider
-from prompt_providers.ollama import OllamaProvider
+import prompt_providers
+from prompt_providers import InMemoryCache, LLMProvider, SQLiteCache, set_llm_cache
 from questions import (
     get_evaluation_questions,
-    get_possible_numbers,
+    get_prepared_combination,
     get_question,
-    get_question_combination,
     get_questions,
+    iter_combinations,
+    prepare_question,
 )
 from result_handler import (
     Result,
-    check_existing_results,
-    export_to_csv,
+    combination_key,
+    export_results_to_csv,
+    export_results_to_parquet,
+    load_all_results,
     save_result,
 )
 
 
+_JSON_BLOCK_RE = re.compile(r"```json\n(.*?)\n```", re.DOTALL)
 
+# One pooled client shared by every provider, so TCP/TLS connections are reused across calls.
+_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=90),
+    timeout=None,
+)
 
-def extract_json_from_response(response_content: str) -> str:
-    """Extracts a JSON string from a response that might include markdown."""
-    # Try to find JSON within ```json ... ```
-    match = re.search(r"```json\n(.*?)\n```", response_content, re.DOTALL)
-    if match:
-        return match.group(1)
 
-    # Fallback to finding the first and last curly brace
-    json_start = response_content.find('{')
-    json_end = response_content.rfind('}') + 1
+def _scan_first_json_object(response_content: str) -> Optional[tuple[int, int]]:
+    """
+    Finds the first balanced ``{...}`` block in a single pass, tracking string
+    state so braces inside JSON strings are ignored.
 
-    if json_start != -1 and json_end != -1:
-        return response_content[json_start:json_end]
+    :return: The ``(start, end)`` slice bounds of the object, or None if no
+        balanced object is found.
+    """
+    start = response_content.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(response_content)):
+        char = response_content[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+
+def extract_json_from_response(response_content: str) -> str:
+    """Extracts a JSON string from a response that might include markdown."""
+    # Try to find JSON within ```json ... ```, but only run the regex if a fence is present at all
+    if "```json" in response_content:
+        match = _JSON_BLOCK_RE.search(response_content)
+        if match:
+            return match.group(1)
+
+    # Fallback to the first balanced curly brace block
+    bounds = _scan_first_json_object(response_content)
+    if bounds:
+        return response_content[bounds[0]:bounds[1]]
     return response_content
 
 
 def get_provider(model_name: str, provider_name: str) -> LLMProvider:
+    # The provider classes are looked up lazily, so only the SDKs in use are imported
     if provider_name == "gemini":
-        return GeminiAPIProvider(model_name)
+        return prompt_providers.GeminiAPIProvider(model_name, http_client=_CLIENT)
     elif provider_name == "ollama":
-        return OllamaProvider(model_name)
+        return prompt_providers.OllamaProvider(model_name, http_client=_CLIENT)
     else:
         raise ValueError(f"Unknown provider: {provider_name}")
 
 
-def evaluate_batch(evaluation_provider, prompt_builder, response, batch, original_question_prompt, retries=3):
+def get_error_evaluation(batch):
+    """
+    Builds the evaluation used when a batch could not be evaluated, marking every question as "error".
+    """
+    return {
+        framework["name"]: dict.fromkeys(
+            (q_item for q in framework["questions"] for q_item in (q if isinstance(q, list) else [q])),
+            "error",
+        )
+        for framework in batch
+    }
+
+
+async def evaluate_batch(evaluation_provider, prompt_builder, response, batch, original_question_prompt, retries=3):
     """
     Evaluates a single batch of questions.
     """
+    # The prompt does not change between retries, only the model's answer does
+    eval_prompt = prompt_builder.build_evaluation_prompt(
+        response, batch, original_question_prompt=original_question_prompt)
     eval_response = None
-    for _ in range(retries):
+    for attempt in range(retries):
         try:
-            eval_prompt = prompt_builder.build_evaluation_prompt(
-                response, batch, original_question_prompt=original_question_prompt)
-            eval_response = evaluation_provider.prompt(eval_prompt, chat_history=None)
+            eval_response = await evaluation_provider.prompt_async(eval_prompt, refresh=attempt > 0)
             json_string = extract_json_from_response(eval_response.content)
-            return json.loads(json_string)
-        except json.JSONDecodeError:
+            evaluation = orjson.loads(json_string)
+        except orjson.JSONDecodeError:
             logging.warning(f"  Retrying due to JSON decoding error: {eval_response.content}")
             continue
+        if not isinstance(evaluation, dict):
+            logging.warning(f"  Retrying due to an evaluation that is not a JSON object: {eval_response.content}")
+            continue
+        # Only frameworks answered with a question-to-answer object are kept, as in get_full_evaluation
+        return {name: answers for name, answers in evaluation.items() if isinstance(answers, dict)}
     else:
         # All retries failed
         logging.error(f"  Failed to decode evaluation JSON after {retries} retries: {eval_response.content}")
-        return {
-            framework["name"]: {
-                q_item: "error"
-                for q in framework["questions"]
-                for q_item in (q if isinstance(q, list) else [q])
-            }
-            for framework in batch
-        }
+        return get_error_evaluation(batch)
 
 
-def get_batched_evaluation(evaluation_provider, prompt_builder, response, evaluation_questions, original_question_prompt, batch_size=5, retries=3):
+def get_evaluation_batches(evaluation_questions, batch_size=5):
     """
-    Gets the evaluation in batches, in parallel.
+    Splits the evaluation frameworks of a question into batches of ``batch_size``.
+    """
+    return [evaluation_questions[i:i+batch_size] for i in range(0, len(evaluation_questions), batch_size)]
+
+
+async def get_batched_evaluation(evaluation_provider, prompt_builder, response, batches, original_question_prompt, retries=3):
+    """
+    Gets the evaluation in precomputed batches, concurrently.
     """
     evaluation = {}
-    batches = [evaluation_questions[i:i+batch_size] for i in range(0, len(evaluation_questions), batch_size)]
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [executor.submit(evaluate_batch, evaluation_provider, prompt_builder, response, batch, original_question_prompt, retries) for batch in batches]
-        for future in concurrent.futures.as_completed(futures):
-            evaluation.update(future.result())
+    # Every batch is scheduled before the first result is awaited, so the batches never run one after another
+    tasks = [
+        asyncio.create_task(evaluate_batch(evaluation_provider, prompt_builder, response, batch,
+                                           original_question_prompt, retries))
+        for batch in batches
+    ]
+    async for task in asyncio.as_completed(tasks):
+        evaluation.update(await task)
 
     return evaluation
 
 
+async def get_full_evaluation(evaluation_provider, prompt_builder, response, batches, original_question_prompt, retries=3):
+    """
+    Gets the evaluation of all frameworks with a single call. Frameworks missing from
+    the answer (e.g. because the output was cut off) are evaluated in batches instead.
+    """
+    evaluation_questions = [framework for batch in batches for framework in batch]
+    eval_prompt = prompt_builder.build_full_evaluation_prompt(
+        response, evaluation_questions, original_question_prompt=original_question_prompt)
+    eval_response = await evaluation_provider.prompt_async(eval_prompt)
+    try:
+        evaluation = orjson.loads(extract_json_from_response(eval_response.content))
+    except orjson.JSONDecodeError:
+        logging.warning(f"  Falling back to batched evaluation due to JSON decoding error: {eval_response.content}")
+        evaluation = {}
+    if not isinstance(evaluation, dict):
+        evaluation = {}
+
+    evaluation = {name: answers for name, answers in evaluation.items() if isinstance(answers, dict)}
+    missing_batches = [
+        [framework for framework in batch if framework["name"] not in evaluation]
+        for batch in batches
+    ]
+    missing_batches = [batch for batch in missing_batches if batch]
+    if missing_batches:
+        logging.warning(f"  Evaluating {sum(map(len, missing_batches))} missing frameworks in batches")
+        evaluation.update(await get_batched_evaluation(
+            evaluation_provider, prompt_builder, response, missing_batches, original_question_prompt, retries))
 
-def main():
-    logging.info("Hello from prompting!")
-    logging.info("Hello from prompting!")
-    with open("prompting/configuration/models.toml", "rb") as f:
-        config = tomllib.load(f)
-        models = config["models"]
-        paths = config.get("paths", {})
-        questions_dir = Path(paths.get("questions_dir", "prompting/configuration/questions"))
-        results_dir = Path(paths.get("results_dir", "results"))
-        log_file = Path(paths.get("log_file", "prompting.log"))
-        evaluation_model_config = next((m for m in models if m.get("use_for_evaluation")), None)
-
-    with open("prompting/configuration/config.toml", "rb") as f:
-        app_config = tomllib.load(f)
-        eval_config = app_config.get("evaluation", {})
-        logging_config = app_config.get("logging", {})
+    return evaluation
 
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format=logging_config.get("format", '%(asctime)s - %(levelname)s - %(message)s'),
-        handlers=[
-            logging.FileHandler(log_file),
-        ],
-        force=True
-    )
-    # Suppress verbose logging from google-generativeai
-    logging.getLogger("google.generativeai").setLevel(logging_config.get("google_genai_level", "WARNING"))
 
-    if not evaluation_model_config:
-        raise ValueError("No model found for evaluation. Please set 'use_for_evaluation' to true for one of the models in models.json.")
+async def log_failure(coroutine, description):
+    """
+    Awaits a coroutine, logging an exception instead of raising it, so one failure
+    does not cancel the tasks gathered with it. Returns None if the coroutine failed.
+    """
+    try:
+        return await coroutine
+    except Exception as e:
+        logging.error(f"{description} failed: {e!r}")
+        return None
 
-    evaluation_provider = get_provider(evaluation_model_config["name"], evaluation_model_config["provider"])
-    prompt_builder = XMLPromptBuilder()
-    question_files = get_questions(questions_dir)
-    model_names = [model["name"] for model in models]
 
-    for question_path in tqdm(question_files, desc="Processing Questions"):
+async def process_combination(provider, evaluation_provider, prompt_builder, question_name, prepared_question,
+                              combination_indices, evaluation_batches, cfg: AppConfig, prompt_semaphore, evaluation_semaphore,
+                              writer=None):
+    """
+    Prompts a single combination of a question, evaluates the response and saves the result.
+    Returns the result, or None if the combination failed. The result is written on the ``writer`` executor, so the event loop never blocks on disk.
+
+    Prompting and evaluation are two pipeline stages bounded by their own semaphores:
+    a combination gives up its prompting slot as soon as the response arrives, so the
+    next combination's question prompt overlaps with this combination's evaluation.
+    """
+    # Results record the combination with 1-based indices
+    combination = {key: index + 1 for key, index in zip(prepared_question.context_keys, combination_indices)}
+    try:
+        async with prompt_semaphore:
+            logging.info(f"\n- Processing Combination: {combination}")
+
+            full_question_parts = get_prepared_combination(
+                prepared_question, combination_indices)
+            prompt_segments = prompt_builder.build_question_segments(
+                full_question_parts)
+            prompt_text = str(prompt_segments)
+            response = await provider.prompt_async(prompt_segments)
+            logging.info(f"  Response: {response.content}")
+
+        async with evaluation_semaphore:
+            # With a single batch the batched path already makes only one call
+            use_single_call = cfg.eval_single_call and len(evaluation_batches) > 1
+            get_evaluation = get_full_evaluation if use_single_call else get_batched_evaluation
+            evaluation = await get_evaluation(
+                evaluation_provider, prompt_builder, response.content, evaluation_batches, prompt_text,
+                retries=cfg.eval_retries
+            )
+
+    except (*provider.request_errors, *evaluation_provider.request_errors) as e:
+        # A failed request only loses this combination; it is retried on the next run
+        logging.error(f"  Error for combination {combination}: {e!r}")
+        return None
+
+    logging.info(f"  Evaluation: {evaluation}")
+
+    result = Result(model_name=provider.model,
+                    question_name=question_name,
+                    combination=combination,
+                    prompt=prompt_text,
+                    response=response.content,
+                    evaluation=evaluation)
+
+    await asyncio.get_running_loop().run_in_executor(writer, save_result, cfg.results_dir, result)
+    logging.info(f"Saved result for combination: {combination}")
+    return result
+
+
+async def process_question(question_path, providers, evaluation_provider, prompt_builder, cfg: AppConfig,
+                           question_semaphore, prompt_semaphore, evaluation_semaphore, writer=None):
+    """
+    Prompts and evaluates every pending combination of one question for all models,
+    then exports the question's results. Questions run concurrently, bounded by
+    ``question_semaphore``; the prompt and evaluation semaphores are shared by all
+    questions, so they cap the load on the providers across the whole run.
+    """
+    async with question_semaphore:
         question_name = question_path.stem
         question = get_question(question_path)
-        for model_config in models:
-            provider = get_provider(model_config["name"], model_config["provider"])
+        prepared_question = prepare_question(question)
+        # The evaluation frameworks are the same for every combination of a question
+        evaluation_batches = get_evaluation_batches(
+            get_evaluation_questions(question), batch_size=cfg.eval_batch_size)
+        keys = prepared_question.context_keys
+        total_combinations = math.prod(len(instructions) for instructions in prepared_question.context_instructions)
+        # Results are kept in memory, so the CSV export does not have to read them back from disk
+        question_results = []
+        pending = []
+        for provider in providers:
             logging.info(
                 f"\n--- Using Provider: {provider.__class__.__name__} ({provider.model}) ---"
             )
 
             logging.info(f"\n--- Processing Question: {question_name} ---")
 
-            existing_combinations = check_existing_results(
-                results_dir, provider.model, question_name)
-            possible_numbers = get_possible_numbers(question)
-            keys = possible_numbers.keys()
-            value_ranges = [range(1, v + 1) for v in possible_numbers.values()]
-            total_combinations = 1
-            for r in value_ranges:
-                total_combinations *= len(r)
-
-            for combination_values in tqdm(itertools.product(*value_ranges), total=total_combinations, desc=f"Combinations for {question_name}", leave=False):
-                combination = dict(zip(keys, combination_values))
-
-                if combination in existing_combinations:
-                    logging.info(f"Skipping existing combination: {combination}")
-                    continue
-
-                logging.info(f"\n- Processing Combination: {combination}")
-
-                full_question_parts = get_question_combination(
-                    question, combination)
-                prompt_text = prompt_builder.build_question_prompt(
-                    full_question_parts)
-                try:
-                    response = provider.prompt(prompt_text, chat_history=None)
-                    logging.info(f"  Response: {response.content}")
-                    # Get evaluation questions
-                    evaluation_questions = get_evaluation_questions(question)
-                    evaluation = get_batched_evaluation(
-                        evaluation_provider, prompt_builder, response.content, evaluation_questions, prompt_text,
-                        batch_size=eval_config.get("batch_size", 5),
-                        retries=eval_config.get("retries", 3)
-                    )
-
-                except httpx.RemoteProtocolError as e:
-                    logging.error(f"  Error: {e}")
-                    continue
-
-                logging.info(f"  Evaluation: {evaluation}")
-
-                result = Result(model_name=provider.model,
-                                question_name=question_name,
-                                combination=combination,
-                                prompt=prompt_text,
-                                response=response.content,
-                                evaluation=evaluation)
-
-                save_result(results_dir, result)
-                logging.info(f"Saved result for combination: {combination}")
+            model_results = load_all_results(cfg.results_dir, question_name, provider.model)
+            question_results.extend(model_results)
+            # Stored combinations are 1-based, iter_combinations yields zero-based indices
+            existing_keys = {
+                tuple(index - 1 for index in key)
+                for key in (combination_key(result.combination, keys) for result in model_results)
+                if None not in key
+            }
 
-            logging.info(
-                f"\n--- Finished processing question: {question_name} ---"
-            )
+            # Filter out finished combinations up front, so a resumed run only iterates the remaining ones
+            pending_indices = [
+                combination_indices for combination_indices in iter_combinations(prepared_question)
+                if combination_indices not in existing_keys
+            ]
+            skipped = total_combinations - len(pending_indices)
+            if skipped:
+                logging.info(f"Skipping {skipped} existing combinations for {provider.model}")
+
+            for combination_indices in pending_indices:
+                pending.append(process_combination(
+                    provider, evaluation_provider, prompt_builder, question_name, prepared_question, combination_indices,
+                    evaluation_batches, cfg,
+                    prompt_semaphore, evaluation_semaphore, writer))
+
+        new_results = await tqdm_asyncio.gather(
+            *(log_failure(combination, f"  Combination of {question_name}") for combination in pending),
+            desc=f"Combinations for {question_name}", leave=False)
+        question_results.extend(result for result in new_results if result is not None)
+
+        logging.info(
+            f"\n--- Finished processing question: {question_name} ---"
+        )
         logging.info("Exporting results to CSV...")
-        export_to_csv(results_dir, question_name, model_names)
+        # Queued behind this question's result writes on the single writer thread
+        await asyncio.get_running_loop().run_in_executor(
+            writer, export_results_to_csv, cfg.results_dir, question_name, question_results)
+        if cfg.export_parquet:
+            await asyncio.get_running_loop().run_in_executor(
+                writer, export_results_to_parquet, cfg.results_dir, question_name, question_results)
         logging.info("Done.")
 
 
+async def main(cfg: AppConfig):
+    logging.info("Hello from prompting!")
+    logging.info("Hello from prompting!")
+
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format=cfg.log_format,
+        handlers=[
+            logging.FileHandler(cfg.log_file),
+        ],
+        force=True
+    )
+    # Suppress verbose logging from google-generativeai
+    logging.getLogger("google.generativeai").setLevel(cfg.google_genai_level)
+
+    evaluation_provider = get_provider(cfg.evaluation_model["name"], cfg.evaluation_model["provider"])
+    prompt_builder = XMLPromptBuilder()
+    question_files = get_questions(cfg.questions_dir)
+    providers = [get_provider(model_config["name"], model_config["provider"]) for model_config in cfg.models]
+    question_semaphore = asyncio.Semaphore(cfg.question_concurrency)
+    prompt_semaphore = asyncio.Semaphore(cfg.prompting_concurrency)
+    evaluation_semaphore = asyncio.Semaphore(cfg.eval_concurrency)
+    # A single writer thread keeps the next-file-number lookup in save_result free of races
+    writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    response_cache = None
+    if cfg.cache_enabled:
+        if cfg.cache_persistent:
+            response_cache = SQLiteCache(cfg.cache_file, maxsize=cfg.cache_maxsize)
+        else:
+            response_cache = InMemoryCache(maxsize=cfg.cache_maxsize)
+    set_llm_cache(response_cache)
+
+    try:
+        # Pre-establish one connection per host before the combination loop starts
+        providers_by_host = {provider.base_url: provider for provider in [evaluation_provider, *providers]}
+        await asyncio.gather(*(provider.warm_up() for provider in providers_by_host.values()))
+
+        # A failing question is logged instead of cancelling the others, which still use the shared client
+        await tqdm_asyncio.gather(
+            *(log_failure(process_question(question_path, providers, evaluation_provider, prompt_builder, cfg,
+                                           question_semaphore, prompt_semaphore, evaluation_semaphore, writer),
+                          f"Question {question_path.stem}")
+              for question_path in question_files),
+            desc="Processing Questions")
+    finally:
+        writer.shutdown(wait=True)
+        set_llm_cache(None)
+        if response_cache is not None:
+            response_cache.close()
+        await _CLIENT.aclose()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main(load_config()))
\ No newline at end of file
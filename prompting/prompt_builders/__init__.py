@@ -1,10 +1,11 @@
 from .default import DefaultPromptBuilder
 from .xml import XMLPromptBuilder
-from .interface import BasePromptBuilder, PromptBuilderInterface
+from .interface import BasePromptBuilder, FrameworkCfg, PromptBuilderInterface
 
 __all__ = [
     "DefaultPromptBuilder",
     "XMLPromptBuilder",
     "BasePromptBuilder",
     "PromptBuilderInterface",
+    "FrameworkCfg",
 ]
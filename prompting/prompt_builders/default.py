@@ -1,32 +1,40 @@
 from typing import Any
+
+from prompt_providers.interface import PromptSegments
+
 from .interface import BasePromptBuilder
 
+
+def _assemble_markdown(question_parts: dict[str, Any]) -> PromptSegments:
+    """
+    Assembles the markdown question prompt. The system instructions, response options
+    and task form the cacheable prefix, the per-combination context the suffix.
+    """
+    system_instructions = question_parts.get("system_instructions") or ""
+    prompt = question_parts.get("prompt") or ""
+    context_str = "\n".join(filter(None, question_parts.get("context") or ()))
+    response_options = question_parts.get("response_options") or ""
+
+    sections = []
+    if system_instructions:
+        sections.append(f"### System Instructions\n{system_instructions}")
+    if response_options:
+        sections.append(f"### Response Options\n{response_options}")
+    sections.append(f"### Task\n{prompt}")
+    cacheable_prefix = "\n\n".join(sections)
+
+    if not context_str:
+        return PromptSegments(cacheable_prefix, "")
+    return PromptSegments(cacheable_prefix + "\n\n", f"### Context\n{context_str}")
+
+
 class DefaultPromptBuilder(BasePromptBuilder):
     """
     The default prompt builder, using a markdown-based template.
     """
 
-    def build_question_prompt(self, question_parts: dict[str, Any]) -> str:
+    def build_question_segments(self, question_parts: dict[str, Any]) -> PromptSegments:
         """
         Builds a question prompt using a markdown template.
         """
-        system_instructions = question_parts.get("system_instructions", "")
-        prompt = question_parts.get("prompt", "")
-        context = question_parts.get("context", [])
-        response_options = question_parts.get("response_options", "")
-
-        prompt_parts = []
-        if system_instructions:
-            prompt_parts.append("### System Instructions\\n" + system_instructions)
-        
-        prompt_parts.append("### Task\\n" + prompt)
-
-        if context:
-            context = [c for c in context if c]
-            if context:
-                prompt_parts.append("### Context\\n" + "\\n".join(context))
-
-        if response_options:
-            prompt_parts.append("### Response Options\\n" + response_options)
-
-        return "\\n\\n".join(prompt_parts)
+        return _assemble_markdown(question_parts)
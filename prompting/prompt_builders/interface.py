@@ -1,7 +1,38 @@
 import abc
+import functools
 import textwrap
 from abc import ABC
-from typing import Any, List
+from itertools import chain
+from typing import Any, List, TypedDict, Union
+
+from prompt_providers.interface import PromptSegments
+
+class FrameworkCfg(TypedDict):
+    """An evaluation framework as given in a question file."""
+    name: str
+    questions: list[Union[str, list[str]]]
+
+
+# Dedented once at import; only the skeleton, question and response vary per call.
+_EVAL_TEMPLATE = textwrap.dedent("""\
+    ### INSTRUCTIONS
+    You are an evaluation model. Your task is to evaluate the following response based on the provided evaluation frameworks and their questions.
+    For each question, you must answer with 'yes' or 'no'.
+    You MUST respond with a single, valid JSON object and nothing else. Do not use markdown formatting.
+
+    The JSON object should have the following format:
+    {{
+    {json_skeleton}
+    }}
+
+    ### ORIGINAL QUESTION
+    {original_question_prompt}
+
+    ### RESPONSE TO EVALUATE
+    {response}
+
+    ### YOUR JSON RESPONSE
+    """)
 
 
 class PromptBuilderInterface(metaclass=abc.ABCMeta):
@@ -9,6 +40,14 @@ class PromptBuilderInterface(metaclass=abc.ABCMeta):
     A formal interface for any class that can build a prompt.
     """
 
+    @abc.abstractmethod
+    def build_question_segments(self, question_parts: dict[str, Any]) -> PromptSegments:
+        """
+        Builds a question prompt from a dictionary of parts, split into the prefix
+        shared by all combinations of the question and the varying suffix.
+        """
+        pass
+
     @abc.abstractmethod
     def build_question_prompt(self, question_parts: dict[str, Any]) -> str:
         """
@@ -20,7 +59,7 @@ class PromptBuilderInterface(metaclass=abc.ABCMeta):
     def build_evaluation_prompt(
         self,
         response: str,
-        evaluation_questions: List[dict[str, Any]],
+        evaluation_questions: List[FrameworkCfg],
         original_question_prompt: str,
     ) -> str:
         """
@@ -28,6 +67,18 @@ class PromptBuilderInterface(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def build_full_evaluation_prompt(
+        self,
+        response: str,
+        evaluation_questions: List[FrameworkCfg],
+        original_question_prompt: str,
+    ) -> str:
+        """
+        Builds a single evaluation prompt covering all evaluation frameworks.
+        """
+        pass
+
 
 class BasePromptBuilder(PromptBuilderInterface, ABC):
     """
@@ -35,54 +86,68 @@ class BasePromptBuilder(PromptBuilderInterface, ABC):
     for the evaluation prompt.
     """
 
+    def build_question_prompt(self, question_parts: dict[str, Any]) -> str:
+        """
+        Builds a question prompt as a single string from its segments.
+        """
+        return str(self.build_question_segments(question_parts))
+
     def build_evaluation_prompt(
         self,
         response: str,
-        evaluation_questions: List[dict[str, Any]],
+        evaluation_questions: List[FrameworkCfg],
         original_question_prompt: str,
     ) -> str:
         """
         Builds an evaluation prompt.
         """
-        framework_json_parts = self._build_json_skeleton(evaluation_questions)
-
-        prompt = textwrap.dedent(f"""\
-            ### INSTRUCTIONS
-            You are an evaluation model. Your task is to evaluate the following response based on the provided evaluation frameworks and their questions.
-            For each question, you must answer with 'yes' or 'no'.
-            You MUST respond with a single, valid JSON object and nothing else. Do not use markdown formatting.
-            
-            The JSON object should have the following format:
-            {{
-            {',\\n'.join(framework_json_parts)}
-            }}
-            
-            ### ORIGINAL QUESTION
-            {original_question_prompt}
-            
-            ### RESPONSE TO EVALUATE
-            {response}
-            
-            ### YOUR JSON RESPONSE
-            """)
-
-        return prompt
+        return _EVAL_TEMPLATE.format(
+            json_skeleton=self._build_json_skeleton(evaluation_questions),
+            original_question_prompt=original_question_prompt,
+            response=response,
+        )
+
+    def build_full_evaluation_prompt(
+        self,
+        response: str,
+        evaluation_questions: List[FrameworkCfg],
+        original_question_prompt: str,
+    ) -> str:
+        """
+        Builds a single evaluation prompt covering all evaluation frameworks.
+        By default this is the regular evaluation prompt with every framework in it.
+        """
+        return self.build_evaluation_prompt(response, evaluation_questions, original_question_prompt)
 
     @staticmethod
-    def _build_json_skeleton(evaluation_questions: list[dict[str, Any]]) -> list[str]:
+    def _build_json_skeleton(evaluation_questions: List[FrameworkCfg]) -> str:
         """
         Build a JSON‑compatible skeleton from a collection of evaluation questions.
+        The joined skeleton is cached per distinct framework configuration.
         """
-        framework_json_parts = []
-        for framework in evaluation_questions:
-            framework_name = framework["name"]
-            questions = framework["questions"]
-            question_lines = [
-                f'      "{sub_q}": "yes_or_no"'
-                for q in questions
-                for sub_q in (q if isinstance(q, list) else [q])
-            ]
-            framework_json_parts.append(
-                f'  "{framework_name}": {{\\n' + ",\\n".join(question_lines) + "\\n  }"
-            )
-        return framework_json_parts
+        framework_key = tuple(
+            (framework["name"], tuple(chain.from_iterable(
+                (q,) if isinstance(q, str) else q for q in framework["questions"]
+            )))
+            for framework in evaluation_questions
+        )
+        return _build_json_skeleton_cached(framework_key)
+
+
+_SKELETON_LINE_PREFIX = '      "'
+_SKELETON_LINE_SUFFIX = '": "yes_or_no"'
+
+
+@functools.lru_cache(maxsize=128)
+def _build_json_skeleton_cached(framework_key: tuple[tuple[str, tuple[str, ...]], ...]) -> str:
+    """
+    Builds the joined JSON skeleton for a framework configuration given as
+    ``(framework_name, sub_questions)`` pairs.
+    """
+    framework_json_parts = []
+    for framework_name, sub_questions in framework_key:
+        question_lines = [_SKELETON_LINE_PREFIX + sub_q + _SKELETON_LINE_SUFFIX for sub_q in sub_questions]
+        framework_json_parts.append(
+            f'  "{framework_name}": {{\n' + ",\n".join(question_lines) + "\n  }"
+        )
+    return ',\n'.join(framework_json_parts)
@@ -1,51 +1,108 @@
-from typing import Any
-from .interface import BasePromptBuilder
+import textwrap
+from typing import Any, List
+from prompt_providers.interface import PromptSegments
+
+from .interface import BasePromptBuilder, FrameworkCfg
+
+_FULL_EVAL_TEMPLATE = textwrap.dedent("""\
+    <instructions>
+    You are an evaluation model. Your task is to evaluate the following response based on every framework in the <frameworks> section and its questions.
+    For each question, you must answer with 'yes' or 'no'.
+    You MUST respond with a single, valid JSON object that contains every framework and nothing else. Do not use markdown formatting.
+    </instructions>
+
+    <frameworks>
+    {framework_sections}
+    </frameworks>
+
+    <json_format>
+    {{
+    {json_skeleton}
+    }}
+    </json_format>
+
+    <original_question>
+    {original_question_prompt}
+    </original_question>
+
+    <response_to_evaluate>
+    {response}
+    </response_to_evaluate>""")
+
+# Pre-rendered segments of the question template, joined around the variable parts.
+# Everything up to the dilemma is the same for all combinations of a question and forms
+# the cacheable prefix; only the context differs between combinations.
+_XML_HEAD = "<system_instructions>\n        "
+_XML_SYSTEM_CLOSE = "\n        </system_instructions>\n        "
+_XML_RESPONSE_OPTIONS_OPEN = "\n        <response_options>\n        "
+_XML_RESPONSE_OPTIONS_CLOSE = "\n        </response_options>\n        "
+_XML_FORMATTING = (
+    "\nYou should also provide a reason after you response with a dash.\n\n"
+    "        <formatting_instructions>\n"
+    "        Please respond with only one of the options from the <response_options> section. "
+    "Do not add any other text, explanation, or punctuation.\n"
+    "        </formatting_instructions>\n\n"
+    "        <dilemma_prompt>\n        "
+)
+_XML_PREFIX_TAIL = "\n        </dilemma_prompt>\n\n        "
+_XML_CONTEXT_OPEN = "<context>\n        "
+_XML_CONTEXT_CLOSE = "\n        </context>"
+
 
 class XMLPromptBuilder(BasePromptBuilder):
     """
     A prompt builder that uses an XML-based template.
     """
 
-    def build_question_prompt(self, question_parts: dict[str, Any]) -> str:
+    def build_question_segments(self, question_parts: dict[str, Any]) -> PromptSegments:
         """
-        Builds a question prompt using an XML template.
+        Builds a question prompt using an XML template, with the instructions, response
+        options and formatting instructions ahead of the dilemma and its context.
         """
         system_instructions = question_parts.get("system_instructions", "")
         main_prompt_content = question_parts.get("prompt", "")
         context = question_parts.get("context", [])
         response_option = question_parts.get("response_options", "")
 
-        context_str = "\n".join(c for c in context if c)
+        context_str = "\n".join(filter(None, context))
 
         response_options_block = ""
         if response_option:
-            response_options_block = f"""
-        <response_options>
-        {response_option}
-        </response_options>
+            response_options_block = _XML_RESPONSE_OPTIONS_OPEN + response_option + _XML_RESPONSE_OPTIONS_CLOSE
+
+        cacheable_prefix = "".join((
+            _XML_HEAD, system_instructions,
+            _XML_SYSTEM_CLOSE, response_options_block,
+            _XML_FORMATTING, main_prompt_content,
+            _XML_PREFIX_TAIL,
+        ))
+        return PromptSegments(cacheable_prefix, _XML_CONTEXT_OPEN + context_str + _XML_CONTEXT_CLOSE)
+
+    def build_full_evaluation_prompt(
+        self,
+        response: str,
+        evaluation_questions: List[FrameworkCfg],
+        original_question_prompt: str,
+    ) -> str:
+        """
+        Builds one evaluation prompt for all frameworks, each framework in its
+        own ``<framework>`` section, answered with a single JSON object.
         """
+        framework_sections = "\n".join(
+            f'<framework name="{framework["name"]}">\n'
+            + "\n".join(
+                f"<question>{sub_q}</question>"
+                for q in framework["questions"]
+                for sub_q in (q if isinstance(q, list) else [q])
+            )
+            + "\n</framework>"
+            for framework in evaluation_questions
+        )
+        json_skeleton = self._build_json_skeleton(evaluation_questions)
 
-        prompt_template = """<system_instructions>
-        {system_instructions}
-        </system_instructions>
-
-        <dilemma_prompt>
-        {main_prompt_content}
-        </dilemma_prompt>
-
-        <context>
-        {context}
-        </context>
-        {response_options_block}
-You should also provide a reason after you response with a dash.
-
-        <formatting_instructions>
-        Please respond with only one of the options from the <response_options> section. Do not add any other text, explanation, or punctuation.
-        </formatting_instructions>"""
-
-        return prompt_template.format(
-            system_instructions=system_instructions,
-            main_prompt_content=main_prompt_content,
-            context=context_str,
-            response_options_block=response_options_block,
+        return _FULL_EVAL_TEMPLATE.format(
+            framework_sections=framework_sections,
+            json_skeleton=json_skeleton,
+            original_question_prompt=original_question_prompt,
+            response=response,
         )
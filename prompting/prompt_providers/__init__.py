@@ -1,9 +1,29 @@
-from .gemini_api import GeminiAPIProvider
-from .interface import LLMProvider
-from .ollama import OllamaProvider
+from ._cache import InMemoryCache, LLMCache, SQLiteCache, set_llm_cache
+from .interface import History, LLMProvider, Message, PromptSegments
 
 __all__ = [
-    "interface",
-    "gemini_api",
-    "ollama"
-]
\ No newline at end of file
+    "GeminiAPIProvider",
+    "OllamaProvider",
+    "LLMProvider",
+    "Message",
+    "History",
+    "PromptSegments",
+    "InMemoryCache",
+    "LLMCache",
+    "SQLiteCache",
+    "set_llm_cache",
+]
+
+
+def __getattr__(name: str):
+    """
+    Imports the providers on first access, so the google-genai and ollama SDKs
+    are only loaded when that provider is actually used.
+    """
+    if name == "GeminiAPIProvider":
+        from .gemini_api import GeminiAPIProvider
+        return GeminiAPIProvider
+    if name == "OllamaProvider":
+        from .ollama import OllamaProvider
+        return OllamaProvider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
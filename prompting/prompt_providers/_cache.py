@@ -0,0 +1,125 @@
+import abc
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+class LLMCache(metaclass=abc.ABCMeta):
+    """
+    A formal interface for a store of model responses, keyed by the digest
+    built in :func:`make_cache_key`.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response content, or None on a cache miss."""
+        pass
+
+    @abc.abstractmethod
+    def put(self, key: str, content: str):
+        """Stores the response content under the key."""
+        pass
+
+    def close(self):
+        """Releases the resources held by the cache."""
+        pass
+
+
+class InMemoryCache(LLMCache):
+    """
+    An LRU cache of responses held in memory, bounded by ``maxsize`` entries.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def put(self, key: str, content: str):
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SQLiteCache(LLMCache):
+    """
+    A response cache persisted in a SQLite table, so responses survive restarts.
+    Recently used responses are also kept in an in-memory LRU in front of the table.
+    """
+
+    def __init__(self, path: Path, maxsize: int = 10_000):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._memory = InMemoryCache(maxsize)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._memory.get(key)
+        if content is not None:
+            return content
+        with self._lock:
+            row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._memory.put(key, row[0])
+        return row[0]
+
+    def put(self, key: str, content: str):
+        self._memory.put(key, content)
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, content))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+def set_llm_cache(backend: Optional[LLMCache]):
+    """
+    Sets the response cache used by every provider, or disables caching with None.
+
+    :param backend: An :class:`InMemoryCache`, a :class:`SQLiteCache` or None.
+    """
+    global _llm_cache
+    _llm_cache = backend
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Returns the response cache set with :func:`set_llm_cache`, if any."""
+    return _llm_cache
+
+
+def make_cache_key(model: str, prompt_parts: Iterable[str], chat_history_repr: str = "") -> str:
+    """
+    Builds a compact cache key from the model name, the prompt text and the chat history.
+    The prompt parts are hashed one after another, which gives the same key as
+    hashing the joined prompt without building it.
+
+    :param model: Name of the model the prompt is sent to.
+    :param prompt_parts: The prompt text, possibly split into consecutive parts.
+    :param chat_history_repr: ``repr`` of the chat history, empty without one.
+    :return: Hex digest identifying the request.
+    """
+    digest = hashlib.blake2b(f"{model}\x00".encode(), digest_size=16)
+    for part in prompt_parts:
+        digest.update(part.encode())
+    digest.update(f"\x00{chat_history_repr}".encode())
+    return digest.hexdigest()
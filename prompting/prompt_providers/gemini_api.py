@@ -1,47 +1,187 @@
-from typing import Optional, override, List
+import asyncio
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, override, List
 
-from prompt_providers.interface import LLMProvider, History, Message
+import httpx
+
+from prompt_providers.interface import LLMProvider, History, Message, Prompt, PromptSegments
 
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 
 from dotenv import load_dotenv
 
+load_dotenv()
+
 
 class GeminiAPIProvider(LLMProvider):
     """
     Implements a formal interface for GeminiAPI Provider
     """
-    def __init__(self, model: str):
-        super().__init__(model)
-        load_dotenv()
-        self.client = genai.Client()
+    base_url = "https://generativelanguage.googleapis.com"
+    # The SDK reports HTTP errors such as 429 rate limits as APIError
+    request_errors = (httpx.HTTPError, errors.APIError)
+
+    def __init__(self, model: str, http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(model, http_client)
+        self.client = _shared_client(http_client)
+        # Open chat sessions of the most recent conversations, keyed by id() of the caller's history list.
+        self._chat_sessions: OrderedDict[int, _ConvoState] = OrderedDict()
+        self._async_chat_sessions: OrderedDict[int, _ConvoState] = OrderedDict()
 
     @override
-    def prompt(self, user_prompt: str, chat_history: Optional[History]) -> Message:
+    def _prompt(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
         """
         Implements a prompt function with a chat history object and the users_prompt and returns the message.
+        Segmented prompts are sent as consecutive parts with the invariant prefix first,
+        which is what Gemini's implicit prefix caching matches on.
         :param user_prompt:
         :param chat_history:
         :return:
         """
-        messages: List[Message] = (chat_history or [])
+        state = self._get_convo_state(self._chat_sessions, chat_history, threading.Lock)
+        with state.lock:
+            chat = self._open_chat(self.client.chats, state)
+            response = chat.send_message(build_gemini_message(user_prompt))
+            state.last_len += 2
 
-        gemini_history: List[types.Content] = [
-            types.Content(
-                role=map_role_to_gemini(msg.role),
-                parts=[types.Part(text=msg.content)]
-            )
-            for msg in messages
-        ]
+        return Message(role="assistant", content=response.text)
 
-        chat = self.client.chats.create(model=self.model, history=gemini_history)
-        response = chat.send_message(user_prompt)
+    @override
+    async def _prompt_async(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
+        """
+        Implements the prompt function on the asynchronous Gemini client.
+        :param user_prompt:
+        :param chat_history:
+        :return:
+        """
+        state = self._get_convo_state(self._async_chat_sessions, chat_history, asyncio.Lock)
+        # Turns of one conversation are sent one at a time, so its session sees them in order
+        async with state.lock:
+            chat = self._open_chat(self.client.aio.chats, state)
+            response = await chat.send_message(build_gemini_message(user_prompt))
+            state.last_len += 2
 
         return Message(role="assistant", content=response.text)
 
+    @staticmethod
+    def _get_convo_state(sessions: "OrderedDict[int, _ConvoState]", chat_history: Optional[History],
+                         lock_factory: Callable[[], Any]) -> "_ConvoState":
+        """
+        Returns the state of a conversation. Only the most recent conversations are
+        kept, so finished ones do not stay in memory. Prompts without a history get a
+        fresh state.
+        :param sessions: The sync or async conversation store.
+        :param chat_history:
+        :param lock_factory: Creates the lock of a new conversation, matching the store.
+        :return:
+        """
+        if chat_history is None:
+            return _ConvoState(None, [], None, 0, lock_factory())
+
+        key = id(chat_history)
+        state = sessions.get(key)
+        if state is None or state.history is not chat_history:
+            state = _ConvoState(chat_history, [], None, 0, lock_factory())
+            sessions[key] = state
+            if len(sessions) > _MAX_CHAT_SESSIONS:
+                sessions.popitem(last=False)
+        else:
+            sessions.move_to_end(key)
+        return state
+
+    def _open_chat(self, chats: Any, state: "_ConvoState") -> Any:
+        """
+        Returns the chat session for the next turn of a conversation. The open session
+        is reused as long as the caller's history holds exactly the turns it has seen,
+        i.e. the caller appended the last prompt and its answer. Otherwise a new session
+        is created, converting only the messages added since the last call into Gemini
+        content. Must be called while holding ``state.lock``.
+        :param chats: The sync or async ``chats`` module of the client.
+        :param state:
+        :return:
+        """
+        chat_history = state.history
+        if chat_history is None:
+            return chats.create(model=self.model)
+        if state.chat is not None and state.last_len == len(chat_history):
+            return state.chat
+
+        if len(chat_history) < len(state.gemini_history):
+            state.gemini_history = build_gemini_history(chat_history)
+        else:
+            state.gemini_history.extend(build_gemini_history(chat_history[len(state.gemini_history):]))
+        state.chat = chats.create(model=self.model, history=state.gemini_history)
+        state.last_len = len(chat_history)
+        return state.chat
+
+    @override
+    async def warm_up(self) -> None:
+        """
+        Warms up the connection with a lightweight authenticated request, which
+        also surfaces a missing or invalid API key before the sweep starts.
+        """
+        try:
+            await self.client.aio.models.list(config={"page_size": 1})
+        except (errors.APIError, httpx.HTTPError) as e:
+            logging.warning(f"Could not warm up connection to {self.base_url}: {e}")
+
+
+# Conversations whose chat sessions are kept open per provider
+_MAX_CHAT_SESSIONS = 64
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_client(http_client: Optional[httpx.AsyncClient]) -> genai.Client:
+    """
+    Returns the Gemini client for an (optional) shared httpx client, so all providers
+    using the same connection pool also share one genai.Client and its auth setup.
+    """
+    return genai.Client(http_options=types.HttpOptions(httpx_async_client=http_client))
+
+
+@dataclass(slots=True)
+class _ConvoState:
+    """
+    A conversation: the caller's history list, its messages converted to Gemini
+    content so far, the open chat session, the history length it expects next and
+    the lock that serializes its turns.
+    """
+    history: Optional[History]
+    gemini_history: List[types.Content]
+    chat: Any
+    last_len: int
+    lock: Any
+
+
+def build_gemini_message(user_prompt: Prompt) -> str | List[types.Part]:
+    """Converts the user prompt into a Gemini message, one part per prompt segment."""
+    if isinstance(user_prompt, PromptSegments):
+        return [types.Part(text=part) for part in user_prompt.parts()]
+    return user_prompt
+
+
+def build_gemini_history(chat_history: Optional[History]) -> List[types.Content]:
+    """Converts the internal chat history into Gemini content objects."""
+    messages: List[Message] = (chat_history or [])
+
+    return [
+        types.Content(
+            role=_ROLE_MAP.get(msg.role, msg.role),
+            parts=[types.Part(text=msg.content)]
+        )
+        for msg in messages
+    ]
+
+
+# Internal role names that differ from the ones Gemini expects
+_ROLE_MAP = {"assistant": "model"}
+
+
 def map_role_to_gemini(role: str) -> str:
     """Konvertiert interne Rollennamen in das von Gemini erwartete Format."""
-    if role == "assistant":
-        return "model"
-    return role
\ No newline at end of file
+    return _ROLE_MAP.get(role, role)
\ No newline at end of file
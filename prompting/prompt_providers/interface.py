@@ -1,6 +1,14 @@
 import abc
+import asyncio
+import atexit
+import logging
+import threading
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Coroutine, List, Optional, TypeVar
+
+import httpx
+
+from prompt_providers._cache import LLMCache, get_llm_cache, make_cache_key
 
 
 @dataclass
@@ -10,22 +18,155 @@ class Message:
     content: str
 
 
+@dataclass(frozen=True, slots=True)
+class PromptSegments:
+    """
+    A prompt split into a prefix that is the same for many prompts (instructions,
+    response options, formatting) and the part that varies between them. Providers
+    can send the prefix separately so the backend can reuse its cached prefix.
+    """
+    cacheable_prefix: str
+    variable_suffix: str
+
+    def __str__(self) -> str:
+        return self.cacheable_prefix + self.variable_suffix
+
+    def parts(self) -> tuple[str, ...]:
+        """Returns the non-empty segments in prompt order, without joining them."""
+        return tuple(part for part in (self.cacheable_prefix, self.variable_suffix) if part)
+
+
+T = TypeVar("T")
+
 type History = List[Message]
+type Prompt = str | PromptSegments
 
 
 class LLMProvider(metaclass=abc.ABCMeta):
     """
     A formal interface for any class that can respond to a prompt
     with chat history.
+
+    An optional shared ``httpx.AsyncClient`` can be injected so that all
+    providers reuse the same pooled connections.
     """
-    def __init__(self, model: str):
+    base_url: Optional[str] = None
+    # Errors a single failed request can raise; callers catch these to skip one prompt
+    request_errors: tuple[type[Exception], ...] = (httpx.HTTPError,)
+
+    def __init__(self, model: str, http_client: Optional[httpx.AsyncClient] = None):
         self.model = model
+        self._client = http_client
 
-    @abc.abstractmethod
-    def prompt(self, user_prompt: str, chat_history: Optional[History]) -> Message:
+    def prompt(self, user_prompt: Prompt, chat_history: Optional[History] = None, refresh: bool = False) -> Message:
         """
         Takes a new user prompt and existing history,
-        returns the assistant's new message.
+        returns the assistant's new message. The prompt may be given as
+        :class:`PromptSegments` so the invariant prefix can be sent on its own.
+
+        Responses are served from the cache set with ``set_llm_cache`` when possible;
+        with ``refresh`` the cache is bypassed for reading, e.g. when retrying a bad response.
+        """
+        cache, key = self._cache_lookup(user_prompt, chat_history)
+        if cache is not None and not refresh:
+            content = cache.get(key)
+            if content is not None:
+                return Message(role="assistant", content=content)
+
+        response = self._prompt(user_prompt, chat_history)
+        # Blocked replies have no content; they are not cached, so they are asked again next time
+        if cache is not None and response.content is not None:
+            cache.put(key, response.content)
+        return response
+
+    async def prompt_async(self, user_prompt: Prompt, chat_history: Optional[History] = None,
+                           refresh: bool = False) -> Message:
+        """
+        Asynchronous counterpart of :meth:`prompt`, so many prompts can be
+        awaited concurrently without blocking on the network.
+        """
+        cache, key = self._cache_lookup(user_prompt, chat_history)
+        if cache is not None and not refresh:
+            content = cache.get(key)
+            if content is not None:
+                return Message(role="assistant", content=content)
+
+        response = await self._prompt_async(user_prompt, chat_history)
+        if cache is not None and response.content is not None:
+            cache.put(key, response.content)
+        return response
+
+    def prompt_many(self, prompts: List[Prompt], max_concurrency: int = 10) -> List[Message]:
+        """
+        Sends independent prompts (without chat history) concurrently and returns
+        the answers in the order of ``prompts``. This is a synchronous entry point
+        for scripts; code already running in an event loop should gather
+        :meth:`prompt_async` calls itself.
+
+        Every call, of every provider, runs on the same event loop: the async clients
+        (and their pooled connections) are shared between providers and belong to the
+        loop that opened them.
+
+        :param prompts: The prompts to send.
+        :param max_concurrency: Maximum number of requests in flight at once.
+        :return: One message per prompt.
+        """
+        async def prompt_all() -> List[Message]:
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def prompt_one(user_prompt: Prompt) -> Message:
+                async with semaphore:
+                    return await self.prompt_async(user_prompt)
+
+            return await asyncio.gather(*(prompt_one(user_prompt) for user_prompt in prompts))
+
+        return _run_sync(prompt_all())
+
+    @abc.abstractmethod
+    def _prompt(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
+        """
+        Sends the prompt to the model, bypassing the cache.
         """
         pass
 
+    @abc.abstractmethod
+    async def _prompt_async(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
+        """
+        Sends the prompt to the model asynchronously, bypassing the cache.
+        """
+        pass
+
+    def _cache_lookup(self, user_prompt: Prompt, chat_history: Optional[History]) -> tuple[Optional[LLMCache], str]:
+        """Returns the active cache and the request's key, or (None, "") if caching is off."""
+        cache = get_llm_cache()
+        if cache is None:
+            return None, ""
+        prompt_parts = user_prompt.parts() if isinstance(user_prompt, PromptSegments) else (user_prompt,)
+        return cache, make_cache_key(self.model, prompt_parts, repr(chat_history) if chat_history else "")
+
+    async def warm_up(self) -> None:
+        """
+        Opens a connection to the provider's host ahead of the first prompt,
+        so the TCP/TLS handshake is not paid on the hot path.
+        """
+        if self._client is None or self.base_url is None:
+            return
+        try:
+            await self._client.head(self.base_url)
+        except httpx.HTTPError as e:
+            logging.warning(f"Could not warm up connection to {self.base_url}: {e}")
+
+
+# Event loop of the synchronous prompt_many, shared by all providers and created on first use
+_sync_runner: Optional[asyncio.Runner] = None
+_sync_runner_lock = threading.Lock()
+
+
+def _run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Runs a coroutine to completion on the shared event loop of the synchronous API."""
+    global _sync_runner
+    with _sync_runner_lock:
+        if _sync_runner is None:
+            _sync_runner = asyncio.Runner()
+            atexit.register(_sync_runner.close)
+        return _sync_runner.run(coroutine)
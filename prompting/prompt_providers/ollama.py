@@ -1,31 +1,89 @@
-from dataclasses import asdict
 from typing import Optional, override, List
 
-from prompt_providers.interface import LLMProvider, History, Message
+from prompt_providers.interface import LLMProvider, History, Message, Prompt, PromptSegments
 
-from ollama import chat, ChatResponse
+import httpx
+import orjson
+from ollama import Client, ChatResponse, ResponseError
+
+# One client for the synchronous path, instead of the ollama module's implicit default
+_SYNC_CLIENT = Client()
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 
 class OllamaProvider(LLMProvider):
     """
     Implements a formal interface for Ollama Provider
     """
+    # The synchronous client reports error responses as ResponseError
+    request_errors = (httpx.HTTPError, ResponseError)
+
+    def __init__(self, model: str, http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(model, http_client or httpx.AsyncClient(timeout=None))
+        self.base_url = get_ollama_base_url()
+
     @override
-    def prompt(self, user_prompt: str, chat_history: Optional[History]) -> Message:
+    def _prompt(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
         """
         Implements a prompt function with a chat history object and the users_prompt and returns the message.
         :param user_prompt:
         :param chat_history:
         :return:
         """
-        messages: List[dict] = [
-            asdict(msg)
-            for msg in (chat_history or [])
-        ]
-        messages.append({"role": "user", "content": user_prompt})
-        response: ChatResponse = chat(model=self.model, messages=messages)
+        messages = build_ollama_messages(user_prompt, chat_history)
+        response: ChatResponse = _SYNC_CLIENT.chat(model=self.model, messages=messages)
 
         return Message(
             role=response.message["role"],
             content=response.message["content"],
-        )
\ No newline at end of file
+        )
+
+    @override
+    async def _prompt_async(self, user_prompt: Prompt, chat_history: Optional[History]) -> Message:
+        """
+        Implements the prompt function on the asynchronous Ollama client.
+        :param user_prompt:
+        :param chat_history:
+        :return:
+        """
+        messages = build_ollama_messages(user_prompt, chat_history)
+        # orjson encodes the body straight to UTF-8 bytes, instead of json.dumps plus an encode
+        response = await self._client.post(
+            f"{self.base_url}/api/chat",
+            content=orjson.dumps({"model": self.model, "messages": messages, "stream": False}),
+            headers=_JSON_HEADERS,
+        )
+        response.raise_for_status()
+        message = orjson.loads(response.content)["message"]
+
+        return Message(
+            role=message["role"],
+            content=message["content"],
+        )
+
+
+def get_ollama_base_url() -> str:
+    """
+    Returns the Ollama server URL the synchronous client resolved from OLLAMA_HOST,
+    so both paths talk to the same server, e.g. ``0.0.0.0`` becomes ``http://0.0.0.0:11434``.
+    """
+    return str(_SYNC_CLIENT._client.base_url).rstrip("/")
+
+
+def build_ollama_messages(user_prompt: Prompt, chat_history: Optional[History]) -> List[dict]:
+    """
+    Converts the chat history and the new user prompt into Ollama messages.
+    A segmented prompt sends its invariant prefix as the system message, so
+    Ollama can reuse the evaluated prefix between prompts.
+    """
+    messages: List[dict] = []
+    if isinstance(user_prompt, PromptSegments):
+        if user_prompt.cacheable_prefix and user_prompt.variable_suffix:
+            messages.append({"role": "system", "content": user_prompt.cacheable_prefix})
+            user_prompt = user_prompt.variable_suffix
+        else:
+            # With one segment empty there is nothing to split; the prompt is sent as the user turn
+            user_prompt = str(user_prompt)
+    messages.extend({"role": msg.role, "content": msg.content} for msg in (chat_history or []))
+    messages.append({"role": "user", "content": user_prompt})
+    return messages
@@ -1,6 +1,14 @@
+import functools
+import itertools
+import logging
+import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
-import json
+from typing import Any, Iterator
+
+import orjson
+
+logger = logging.getLogger(__name__)
 
 
 def get_questions(questions_dir: Path) -> list[Path]:
@@ -12,70 +20,109 @@ def get_questions(questions_dir: Path) -> list[Path]:
     :returns: Paths of the JSON files found in the specified directory.
     :rtype: list[Path]
     """
-    return list(questions_dir.glob("*.json"))
+    with os.scandir(questions_dir) as entries:
+        return [Path(entry.path) for entry in entries if entry.name.endswith(".json") and entry.is_file()]
 
 
 def get_question(filepath: Path) -> dict[str, str]:
     """
-    Function to load a question from a JSON file.
+    Function to load a question from a JSON file. Parsed questions are cached
+    until the file's modification time changes, so they must not be mutated.
 
     :param filepath:
         Path to the JSON file containing the question.
 
     :return:
-        The question data as a dictionary. If the file cannot be parsed as JSON,
-        an empty dictionary is returned.  If the file does not exist, the function
-        prints an error message and returns `None` indirectly via the last
-        attempted return.
+        The question data as a dictionary. If the file does not exist or cannot
+        be parsed as JSON, an error is logged and an empty dictionary
+        is returned.
     :rtype: dict[str, str]
     """
     try:
-        with filepath.open("r") as f:
-            question = json.load(f)
+        mtime_ns = os.stat(filepath).st_mtime_ns
     except FileNotFoundError:
-        print("Question not found")
-    except json.decoder.JSONDecodeError:
-        print("Question not decoded correctly")
+        logger.error("Question not found: %s", filepath)
         return {}
-    return question
+    return _load_question(str(filepath), mtime_ns)
 
 
-def get_possible_numbers(question: dict[str, Any]) -> dict[str, int]:
-    """
-    Get the number of items in each list within the ``situation_or_context`` part of the
-    question dictionary.
+@functools.lru_cache(maxsize=256)
+def _load_question(filepath: str, mtime_ns: int) -> dict[str, str]:
+    """Parses a question file; the modification time is only part of the cache key."""
+    try:
+        with open(filepath, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        logger.error("Question not found: %s", filepath)
+    except orjson.JSONDecodeError:
+        logger.error("Question not decoded correctly: %s", filepath)
+    return {}
+
 
-    :param question: The dict that holds the ``situation_or_context`` mapping among
-       other keys.  The mapping contains keys whose values are iterable sequences.
-    :return: A dict that maps each key from the ``situation_or_context`` mapping
-       to the integer length of its sequence.
-    :rtype: dict[str, int]
+@dataclass(frozen=True, slots=True)
+class PreparedQuestion:
     """
+    A question with its ``situation_or_context`` flattened into instruction tuples,
+    so a combination is resolved by indexing instead of dict lookups.
+    """
+    system_instructions: str
+    prompt: str
+    response_options: str
+    context_keys: tuple[str, ...]
+    context_instructions: tuple[tuple[str, ...], ...]  # [key position][element index] -> instruction
+
 
-    situation_or_context = question.get("situation_or_context", {})
-    all_context_keys = situation_or_context.keys()
-    lengths = {key: len(situation_or_context.get(key, [])) for key in all_context_keys}
+def prepare_question(question: dict[str, Any]) -> PreparedQuestion:
+    """
+    Flattens a question once, so its combinations can be assembled by index.
 
-    return lengths
+    :param question: The question data.
+    :return: The prepared question; ``context_keys`` keeps the order of ``situation_or_context``.
+    """
+    situation_or_context: dict[str, list[dict[str, str]]] = question.get("situation_or_context", {})
+    context_instructions = []
+    for key, element_list in situation_or_context.items():
+        instructions = []
+        for index, target_object in enumerate(element_list, start=1):
+            try:
+                instructions.append(_get_instruction(target_object))
+            except (TypeError, AttributeError) as e:
+                logger.warning("Error receiving instruction for key=%r, index=%r: %s", key, index, e)
+                instructions.append("")
+        context_instructions.append(tuple(instructions))
+
+    return PreparedQuestion(
+        system_instructions=question.get("system_instructions", ""),
+        prompt=question.get("prompt", ""),
+        response_options=question.get("response_options", ""),
+        context_keys=tuple(situation_or_context.keys()),
+        context_instructions=tuple(context_instructions),
+    )
+
+
+def iter_combinations(prepared: PreparedQuestion) -> Iterator[tuple[int, ...]]:
+    """
+    Yields every combination of a prepared question as zero-based indices in the
+    order of ``prepared.context_keys``.
+    """
+    return itertools.product(*(range(len(instructions)) for instructions in prepared.context_instructions))
 
 
-def get_question_combination(question: dict[str, Any], combination: dict[str, int]) -> dict[str, Any]:
+def get_prepared_combination(prepared: PreparedQuestion, combination_indices: tuple[int, ...]) -> dict[str, Any]:
     """
-    Extracts and assembles the instruction set for a question based on a
-    combination mapping.
+    Assembles the instruction set for a prepared question. The combination is given as
+    zero-based indices in the order of ``prepared.context_keys``, as yielded by
+    :func:`iter_combinations`, so every index is known to be in range.
     """
-    system_instructions = question.get("system_instructions", "")
-    prompt = question.get("prompt", "")
-    response_options = question.get("response_options", "")
-    situation_or_context_obj: dict[str, list[dict[str, str]]] = question.get("situation_or_context", {})
-    
-    context = get_situation_or_context(situation_or_context_obj, combination)
-    
+    context = [
+        instructions[index]
+        for instructions, index in zip(prepared.context_instructions, combination_indices)
+    ]
     return {
-        "system_instructions": system_instructions,
-        "prompt": prompt,
+        "system_instructions": prepared.system_instructions,
+        "prompt": prepared.prompt,
         "context": context,
-        "response_options": response_options
+        "response_options": prepared.response_options
     }
 
 
@@ -88,33 +135,6 @@ def _get_instruction(target_object: dict[str, str]) -> str:
     return instruction_string
 
 
-def get_situation_or_context(situation_or_context: dict[str, list[dict[str, str]]], combination: dict[str, int]) -> \
-list[str]:
-    """
-    Retrieve a list of instruction strings based on a situation/context mapping
-    and a combination of keys with 1-based indices.
-
-    A 'Frame' element can be defined globally in 'imaginary_self' or locally
-    within a specific context list. The local frame will take precedence.
-    """
-    result: list[str] = []
-
-    for key, index in combination.items():
-        zero_based_index = index - 1
-        element_list = situation_or_context.get(key, [])
-        full_instruction = ""
-
-        try:
-            target_object = element_list[zero_based_index]
-            full_instruction = _get_instruction(target_object)
-        except (IndexError, TypeError, KeyError) as e:
-            print(f"Error receiving instruction for key='{key}', index={index}: {e}")
-
-        result.append(full_instruction)
-
-    return result
-
-
 def get_evaluation_questions(question: dict[str, Any]) -> list[dict[str, Any]]:
     """
     Retrieves the evaluation frameworks and their questions from the question data.
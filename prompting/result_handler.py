@@ -1,12 +1,17 @@
-import json
-from dataclasses import asdict, dataclass
+import concurrent.futures
+import csv
+import os
+import re
+import sys
+from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-import pandas as pd
+import orjson
 
 
-@dataclass
+@dataclass(slots=True)
 class Result:
     model_name: str
     question_name: str
@@ -16,98 +21,317 @@ class Result:
     evaluation: Dict[str, Dict[str, str]]
 
 
-def get_results_dir(base_results_dir: Path, question_name: str, model_name: str = None) -> Path:
+# Results directories already created in this process, so saving skips the mkdir syscall
+_created_dirs: Set[Path] = set()
+
+
+def _ensure_results_dir(base_results_dir: Path, question_name: str, model_name: str = None) -> Path:
     """
     Retrieve (or create) the directory where results for a specific model and
     question are stored. If model_name is None, it returns the directory for the question.
+    Only writers use this; readers take :func:`_results_dir_path` and treat a missing
+    directory as empty.
 
     :param base_results_dir: Base directory for storing results.
     :param model_name: Name of the model whose results are being saved.
     :param question_name: Identifier for the specific question or task.
     :return: Path object pointing to the created or existing results directory.
     """
-    if model_name:
-        results_dir = base_results_dir / model_name / question_name
-    else:
-        results_dir = base_results_dir / question_name
-    results_dir.mkdir(parents=True, exist_ok=True)
+    results_dir = _results_dir_path(base_results_dir, question_name, model_name)
+    if results_dir not in _created_dirs:
+        results_dir.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(results_dir)
     return results_dir
 
 
+def _results_dir_path(base_results_dir: Path, question_name: str, model_name: str = None) -> Path:
+    """Returns the results directory like :func:`_ensure_results_dir`, without creating it."""
+    if model_name:
+        return base_results_dir / model_name / question_name
+    return base_results_dir / question_name
+
+
+# Result file names, ``result_{i}.json``
+_RESULT_FILE_RE = re.compile(r"result_(\d+)\.json")
+
+# Next free result file number per results directory, so saving does not probe the existing files
+_next_index: Dict[Path, int] = {}
+
+
+def _scan_next_index(results_dir: Path) -> int:
+    """Returns one past the highest result file number in the directory."""
+    with os.scandir(results_dir) as entries:
+        return max(
+            (int(match.group(1)) for entry in entries if (match := _RESULT_FILE_RE.fullmatch(entry.name))),
+            default=-1,
+        ) + 1
+
+
+def _to_dict(result: Result) -> Dict:
+    """
+    Builds the JSON document of a result. Unlike ``dataclasses.asdict`` this does not
+    deep-copy the nested dicts, which are only read while serializing.
+    """
+    return {
+        "model_name": result.model_name,
+        "question_name": result.question_name,
+        "combination": result.combination,
+        "prompt": result.prompt,
+        "response": result.response,
+        "evaluation": result.evaluation,
+    }
+
+
 def save_result(base_results_dir: Path, result: Result):
-    """Saves a single result to a JSON file."""
-    results_dir = get_results_dir(base_results_dir, result.question_name, result.model_name)
+    """
+    Saves a single result to a JSON file named ``result_{i}.json``. The file is claimed
+    with O_CREAT | O_EXCL, so an existing file is never overwritten.
+    """
+    results_dir = _ensure_results_dir(base_results_dir, result.question_name, result.model_name)
+    # Serialized up front, so the claimed file gets the whole document in one write
+    # and a result that cannot be serialized never leaves an empty file behind
+    payload = orjson.dumps(_to_dict(result), option=orjson.OPT_INDENT_2)
 
-    # Find the next available file number
-    i = 0
+    i = _next_index.get(results_dir)
+    if i is None:
+        i = _scan_next_index(results_dir)
     while True:
-        result_file = results_dir / f"result_{i}.json"
-        if not result_file.exists():
+        try:
+            fd = os.open(results_dir / f"result_{i}.json", os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
             break
-        i += 1
+        except FileExistsError:
+            i += 1
+    _next_index[results_dir] = i + 1
+
+    with os.fdopen(fd, "wb") as f:
+        f.write(payload)
+
+
+# Below this many new files, results are loaded serially rather than on a thread pool
+_PARALLEL_LOAD_THRESHOLD = 16
 
-    with open(result_file, "w") as f:
-        json.dump(asdict(result), f, indent=4)
+# Loaded results per results directory, with the directory's mtime they were loaded at
+_results_cache: Dict[Path, Tuple[int, Dict[str, Result]]] = {}
+
+
+def _load_result(path: str) -> Result:
+    """
+    Reads and parses a single result file. The strings that repeat across results
+    (model and question names, prompts shared by all models, evaluation answers)
+    are interned, so the cached results hold one copy of each.
+    """
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    data["model_name"] = sys.intern(data["model_name"])
+    data["question_name"] = sys.intern(data["question_name"])
+    data["prompt"] = sys.intern(data["prompt"])
+    for answers in data["evaluation"].values():
+        # Older results may hold whatever the evaluator returned for a framework
+        if not isinstance(answers, dict):
+            continue
+        for question, answer in answers.items():
+            if isinstance(answer, str):
+                answers[question] = sys.intern(answer)
+    return Result(**data)
 
 
 def load_all_results(base_results_dir: Path, question_name: str, model_name: str = None) -> List[Result]:
-    """Loads all results for a given model and question."""
+    """
+    Loads all results for a given model and question, or for every model if model_name
+    is None. Results are cached per directory and reloaded only when the directory's
+    mtime changes, i.e. when files were added or removed; result files are never
+    rewritten in place. Missing directories have no results and are not created.
+    """
     if model_name:
-        results_dir = get_results_dir(base_results_dir, question_name, model_name)
-        results = []
-        for result_file in results_dir.glob("result_*.json"):
-            with open(result_file, "r") as f:
-                data = json.load(f)
-                results.append(Result(**data))
-        return results
+        return _load_results_dir(_results_dir_path(base_results_dir, question_name, model_name))
+
+    results = []
+    with os.scandir(base_results_dir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                results.extend(_load_results_dir(Path(entry.path) / question_name))
+    return results
+
+
+def _load_results_dir(results_dir: Path) -> List[Result]:
+    """Loads the results of a single results directory, through the directory cache."""
+    try:
+        mtime_ns = os.stat(results_dir).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _results_cache.get(results_dir)
+    if cached is not None and cached[0] == mtime_ns:
+        return list(cached[1].values())
+
+    # Only files added since the last load are parsed; removed files are dropped
+    previous = cached[1] if cached is not None else {}
+    results_by_name = {}
+    new_entries = []
+    with os.scandir(results_dir) as entries:
+        for entry in entries:
+            if _RESULT_FILE_RE.fullmatch(entry.name) and entry.is_file(follow_symlinks=False):
+                result = previous.get(entry.name)
+                if result is None:
+                    new_entries.append((entry.name, entry.path))
+                results_by_name[entry.name] = result
+
+    paths = [path for _, path in new_entries]
+    if len(paths) < _PARALLEL_LOAD_THRESHOLD:
+        loaded = map(_load_result, paths)
     else:
-        results = []
-        for model_dir in base_results_dir.iterdir():
-            if model_dir.is_dir():
-                results.extend(load_all_results(base_results_dir, question_name, model_dir.name))
-        return results
+        # Reading and parsing many small files overlaps well across threads
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(paths))) as executor:
+            loaded = list(executor.map(_load_result, paths))
+    for (name, _), result in zip(new_entries, loaded):
+        results_by_name[name] = result
+    _results_cache[results_dir] = (mtime_ns, results_by_name)
+    return list(results_by_name.values())
 
 
-def check_existing_results(base_results_dir: Path, model_name: str,
-                           question_name: str) -> List[Dict[str, int]]:
-    """Checks for existing results and returns a list of completed combinations."""
-    results = load_all_results(base_results_dir, question_name, model_name)
-    return [result.combination for result in results]
+def combination_key(combination: Dict[str, int], keys: Tuple[str, ...]) -> Tuple[int, ...]:
+    """
+    Returns a hashable key for a combination: its values ordered like ``keys``.
+    This is the same shape as the value tuples yielded by ``itertools.product``.
+    """
+    return tuple(combination.get(key) for key in keys)
+
 
+# The CSV is formatted row by row; a large buffer turns that into few large writes
+_CSV_BUFFER_SIZE = 1 << 20
 
-def export_to_csv(base_results_dir: Path, question_name: str, model_names: List[str]):
-    """Exports all results for a given question and list of models to a CSV file."""
-    all_results = []
-    for model_name in model_names:
-        all_results.extend(load_all_results(base_results_dir, question_name, model_name))
 
+def export_results_to_csv(base_results_dir: Path, question_name: str, all_results: List[Result]):
+    """
+    Exports already loaded results of a question to a CSV file, without reading
+    the result files from disk again. Rows are flattened and written one at a time.
+    """
     if not all_results:
         return
 
-    results_dir = get_results_dir(base_results_dir, question_name)
+    results_dir = _ensure_results_dir(base_results_dir, question_name)
     csv_file = results_dir / "results.csv"
 
-    # Flatten the data for CSV export
-    flattened_data = []
-    for result in all_results:
-        flat_result = {
-            "model_name": result.model_name,
-            "question_name": result.question_name,
-            "response": result.response,
-        }
-        # Add combination fields
-        for key, value in result.combination.items():
-            flat_result[f"combination_{key}"] = str(value)
-
-        # Add evaluation fields
-        for framework, questions in result.evaluation.items():
-            for question, answer in questions.items():
-                flat_result[f"eval_{framework}_{question}"] = answer
-
-        # The prompt is now a single string
-        flat_result["prompt"] = result.prompt
-
-        flattened_data.append(flat_result)
-
-    df = pd.DataFrame(flattened_data)
-    df.to_csv(csv_file, index=False)
+    # Usually every result has the same combination keys and evaluation questions; then
+    # the columns are taken from the first result and rows are written as plain tuples
+    schema = _common_result_schema(all_results)
+    if schema is not None:
+        with open(csv_file, "w", encoding="utf-8", newline="", buffering=_CSV_BUFFER_SIZE) as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(_schema_columns(*schema))
+            writer.writerows(_schema_row(result, *schema) for result in all_results)
+        return
+
+    # All columns in order of first appearance; rows without a column leave it empty
+    fieldnames = list(dict.fromkeys(chain.from_iterable(map(_result_columns, all_results))))
+
+    with open(csv_file, "w", encoding="utf-8", newline="", buffering=_CSV_BUFFER_SIZE) as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+        for result in all_results:
+            writer.writerow(_flatten_result(result))
+
+
+def export_results_to_parquet(base_results_dir: Path, question_name: str, all_results: List[Result]):
+    """
+    Exports already loaded results of a question to a zstd-compressed Parquet file with
+    the same columns as the CSV export. Requires pyarrow (the ``parquet`` extra).
+    """
+    if not all_results:
+        return
+
+    # Imported here, so pyarrow is only needed when Parquet export is enabled
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    results_dir = _ensure_results_dir(base_results_dir, question_name)
+    parquet_file = results_dir / "results.parquet"
+
+    schema = _common_result_schema(all_results)
+    if schema is not None:
+        # The tuple rows are transposed into columns, without a dict per result
+        fieldnames = _schema_columns(*schema)
+        values_by_column = zip(*(_schema_row(result, *schema) for result in all_results))
+    else:
+        fieldnames = list(dict.fromkeys(chain.from_iterable(map(_result_columns, all_results))))
+        rows = [_flatten_result(result) for result in all_results]
+        values_by_column = ([row.get(name) for row in rows] for name in fieldnames)
+    columns = {
+        name: pa.array([None if value is None else str(value) for value in values], type=pa.string())
+        for name, values in zip(fieldnames, values_by_column)
+    }
+    # Model and question names repeat on every row and compress to a dictionary
+    for name in ("model_name", "question_name"):
+        columns[name] = columns[name].dictionary_encode()
+
+    pq.write_table(pa.table(columns), parquet_file, compression="zstd")
+
+
+def _result_schema(result: Result) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+    """Returns the combination keys and the (framework, question) pairs of a result, in order."""
+    return (
+        tuple(result.combination),
+        tuple((framework, question) for framework, questions in result.evaluation.items() for question in questions),
+    )
+
+
+def _common_result_schema(all_results: List[Result]) -> Optional[Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]]:
+    """Returns the schema shared by all results, or None if they differ."""
+    schema = _result_schema(all_results[0])
+    if all(_result_schema(result) == schema for result in all_results):
+        return schema
+    return None
+
+
+def _schema_columns(combination_keys: Tuple[str, ...], evaluation_keys: Tuple[Tuple[str, str], ...]) -> List[str]:
+    """Returns the column names for results of the given schema."""
+    return [
+        "model_name", "question_name", "response",
+        *(f"combination_{key}" for key in combination_keys),
+        *(f"eval_{framework}_{question}" for framework, question in evaluation_keys),
+        "prompt",
+    ]
+
+
+def _schema_row(result: Result, combination_keys: Tuple[str, ...],
+                evaluation_keys: Tuple[Tuple[str, str], ...]) -> Tuple:
+    """Returns the row of a result as a tuple in the order of :func:`_schema_columns`."""
+    return (
+        result.model_name, result.question_name, result.response,
+        *(str(result.combination[key]) for key in combination_keys),
+        *(result.evaluation[framework][question] for framework, question in evaluation_keys),
+        result.prompt,
+    )
+
+
+def _result_columns(result: Result) -> Iterator[str]:
+    """Yields the CSV column names of a result, in the order of :func:`_flatten_result`."""
+    yield "model_name"
+    yield "question_name"
+    yield "response"
+    for key in result.combination:
+        yield f"combination_{key}"
+    for framework, questions in result.evaluation.items():
+        for question in questions:
+            yield f"eval_{framework}_{question}"
+    yield "prompt"
+
+
+def _flatten_result(result: Result) -> Dict[str, str]:
+    """Flattens a result into a single CSV row."""
+    flat_result = {
+        "model_name": result.model_name,
+        "question_name": result.question_name,
+        "response": result.response,
+    }
+    # Add combination fields
+    for key, value in result.combination.items():
+        flat_result[f"combination_{key}"] = str(value)
+
+    # Add evaluation fields
+    for framework, questions in result.evaluation.items():
+        for question, answer in questions.items():
+            flat_result[f"eval_{framework}_{question}"] = answer
+
+    # The prompt is now a single string
+    flat_result["prompt"] = result.prompt
+    return flat_result